@@ -0,0 +1,248 @@
+function switchTab(tabName) {
+    // Hide all tabs
+    document.querySelectorAll('.tab-content').forEach(tab => {
+        tab.classList.remove('active');
+    });
+    document.querySelectorAll('.tab').forEach(tab => {
+        tab.classList.remove('active');
+    });
+
+    // Show selected tab
+    document.getElementById(tabName).classList.add('active');
+    event.target.classList.add('active');
+
+    // Load content for the tab
+    if (tabName === 'videos') loadVideos(false);
+    if (tabName === 'shorts') loadVideos(true);
+    if (tabName === 'playlists') loadPlaylists();
+}
+
+async function downloadContent() {
+    const url = document.getElementById('video-url').value;
+    const tags = document.getElementById('tags').value.split(',').map(t => t.trim());
+    const statusDiv = document.getElementById('download-status');
+
+    if (!url) {
+        showStatus('error', 'Please enter a URL');
+        return;
+    }
+
+    statusDiv.style.display = 'block';
+    statusDiv.className = 'status';
+    statusDiv.textContent = 'Queueing download...';
+
+    try {
+        const endpoint = url.includes('playlist') ? '/api/download-playlist' : '/api/download-video';
+        const response = await fetch(endpoint, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ url, tags })
+        });
+
+        const result = await response.json();
+
+        if (result.status === 'queued') {
+            showStatus('success', result.message || 'Download queued');
+            document.getElementById('video-url').value = '';
+            document.getElementById('tags').value = '';
+            pollTask(result.task_id);
+        } else {
+            showStatus('error', result.message || 'Download failed');
+        }
+    } catch (error) {
+        showStatus('error', 'Error: ' + error.message);
+    }
+}
+
+async function pollTask(taskId) {
+    try {
+        const response = await fetch(`/api/tasks/${taskId}`);
+        const task = await response.json();
+
+        if (task.status === 'completed') {
+            showStatus('success', task.message);
+        } else if (task.status === 'error') {
+            showStatus('error', task.message);
+        } else {
+            showStatus('success', task.message);
+            setTimeout(() => pollTask(taskId), 2000);
+        }
+    } catch (error) {
+        showStatus('error', 'Error: ' + error.message);
+    }
+}
+
+function showStatus(type, message) {
+    const statusDiv = document.getElementById('download-status');
+    statusDiv.style.display = 'block';
+    statusDiv.className = 'status ' + type;
+    statusDiv.textContent = message;
+}
+
+const PAGE_SIZE = 50;
+const pageOffsets = {};
+const searchTimers = {};
+const searchControllers = {};
+
+// Last first page fetched per grid, reused for narrower searches
+let _videoCache = { short: null, full: null };
+
+function renderVideoCard(video, isShort) {
+    return `
+        <div class="video-card" data-stream-url="${video.stream_url}" onclick="playVideo(this)">
+            <img class="video-thumbnail" 
+                 src="/api/thumbnail/${video.id}" 
+                 alt="${video.title}"
+                 onerror="this.src='data:image/svg+xml,%3Csvg xmlns=\'http://www.w3.org/2000/svg\' width=\'100\' height=\'100\'%3E%3Crect fill=\'%23ddd\' width=\'100\' height=\'100\'/%3E%3C/svg%3E'">
+            <div class="video-info">
+                <div class="video-title">${video.title}</div>
+                <div class="video-uploader">${video.uploader}</div>
+                ${isShort ? '<span class="badge">Short</span>' : ''}
+            </div>
+        </div>
+    `;
+}
+
+function matchesSearch(video, query) {
+    // Mirrors the server's search: every word prefixes a word in the title or uploader
+    const words = query.toLowerCase().match(/[\p{L}\p{N}]+/gu) || [];
+    const tokens = `${video.title} ${video.uploader}`.toLowerCase().match(/[\p{L}\p{N}]+/gu) || [];
+    return words.every(word => tokens.some(token => token.startsWith(word)));
+}
+
+function renderVideos(isShort, videos, searchQuery, append = false) {
+    const gridId = isShort ? 'shorts-grid' : 'videos-grid';
+    const grid = document.getElementById(gridId);
+
+    if (!append && videos.length === 0) {
+        grid.innerHTML = searchQuery
+            ? '<p style="padding: 20px; text-align: center; color: #666;">No videos match your search.</p>'
+            : '<p style="padding: 20px; text-align: center; color: #666;">No videos yet. Download some to get started!</p>';
+        return;
+    }
+
+    const cards = videos.map(video => renderVideoCard(video, isShort)).join('');
+    const loadMore = grid.querySelector('.load-more');
+    if (loadMore) loadMore.remove();
+
+    if (append) {
+        grid.insertAdjacentHTML('beforeend', cards);
+    } else {
+        grid.innerHTML = cards;
+    }
+
+    // Offer the next page when this one was full
+    if (videos.length === PAGE_SIZE) {
+        grid.insertAdjacentHTML('beforeend', `
+            <button class="btn load-more" style="grid-column: 1 / -1;" onclick="loadVideos(${isShort}, true)">Load more</button>
+        `);
+    }
+}
+
+async function loadVideos(isShort, append = false) {
+    const gridId = isShort ? 'shorts-grid' : 'videos-grid';
+    const searchId = isShort ? 'shorts-search' : 'video-search';
+    const sortId = isShort ? null : 'video-sort';
+    const grid = document.getElementById(gridId);
+
+    const searchQuery = document.getElementById(searchId).value.trim();
+    const sortBy = sortId ? document.getElementById(sortId).value : 'recent';
+    const offset = append ? pageOffsets[gridId] : 0;
+
+    // Cancel any request still in flight for this grid
+    if (searchControllers[gridId]) {
+        searchControllers[gridId].abort();
+    }
+    const controller = new AbortController();
+    searchControllers[gridId] = controller;
+
+    // Show loading state
+    if (!append) {
+        grid.innerHTML = '<p style="padding: 20px; text-align: center;">Loading...</p>';
+    }
+
+    try {
+        const params = new URLSearchParams({
+            is_short: isShort,
+            q: searchQuery,
+            sort: sortBy,
+            limit: PAGE_SIZE,
+            offset: offset
+        });
+        const response = await fetch(`/api/videos?${params}`, { signal: controller.signal });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const videos = await response.json();
+        pageOffsets[gridId] = offset + videos.length;
+
+        if (!append) {
+            _videoCache[isShort ? 'short' : 'full'] = {
+                query: searchQuery.toLowerCase(),
+                sort: sortBy,
+                videos: videos,
+                // A short first page holds every match for this query
+                complete: videos.length < PAGE_SIZE
+            };
+        }
+
+        renderVideos(isShort, videos, searchQuery, append);
+    } catch (error) {
+        if (error.name === 'AbortError') return;
+        grid.innerHTML = '<p>Error loading videos: ' + error.message + '</p>';
+    }
+}
+
+async function loadPlaylists() {
+    const list = document.getElementById('playlists-list');
+
+    try {
+        const response = await fetch('/api/playlists');
+        const playlists = await response.json();
+
+        list.innerHTML = playlists.map(playlist => `
+            <div style="padding: 20px; border: 1px solid #ddd; border-radius: 8px; margin-bottom: 15px;">
+                <h3>${playlist.name}</h3>
+                <p>${playlist.description || 'No description'}</p>
+                <small>Created: ${new Date(playlist.created_date).toLocaleDateString()}</small>
+            </div>
+        `).join('');
+    } catch (error) {
+        list.innerHTML = '<p>Error loading playlists</p>';
+    }
+}
+
+function filterVideos(isShort) {
+    const gridId = isShort ? 'shorts-grid' : 'videos-grid';
+    const searchId = isShort ? 'shorts-search' : 'video-search';
+    const sortId = isShort ? null : 'video-sort';
+
+    const searchQuery = document.getElementById(searchId).value.trim();
+    const sortBy = sortId ? document.getElementById(sortId).value : 'recent';
+    const cached = _videoCache[isShort ? 'short' : 'full'];
+
+    // Narrowing a complete result set: filter it here instead of refetching
+    if (cached && cached.complete && cached.sort === sortBy &&
+            searchQuery.toLowerCase().startsWith(cached.query)) {
+        clearTimeout(searchTimers[gridId]);
+        if (searchControllers[gridId]) {
+            searchControllers[gridId].abort();
+        }
+        renderVideos(isShort, cached.videos.filter(video => matchesSearch(video, searchQuery)), searchQuery);
+        return;
+    }
+
+    // Wait for a pause in typing before querying the server
+    clearTimeout(searchTimers[gridId]);
+    searchTimers[gridId] = setTimeout(() => loadVideos(isShort), 150);
+}
+
+function playVideo(card) {
+    // Open video in new window or implement custom player
+    // The stream URL carries a signed token, so no extra lookup is needed
+    window.open(card.dataset.streamUrl, '_blank');
+}
+
+// Load videos on initial page load
+// loadVideos(false);
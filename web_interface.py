@@ -5,37 +5,98 @@ Run with: uvicorn web_interface:app --reload --host 0.0.0.0 --port 8000
 
 """
 Observation:
-- DOesn't download when already downloading something (It does. But doesn't show/tell)
 - pressing 'Enter' doesn't start the download
 """
 
-from fastapi import FastAPI, BackgroundTasks, HTTPException, Request
-from fastapi.responses import HTMLResponse, FileResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, HttpUrl
 from typing import Optional, List
 import sqlite3
 from pathlib import Path
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.parse import quote
+import base64
+import hashlib
+import hmac
 import mimetypes
+import os
+import re
+import secrets
+import threading
+import time
+import anyio
+import queue
+import uuid
 
 # Import the download manager (assumes previous code is saved as youtube_manager.py)
 from youtube_manager import YouTubeDownloadManager
 
 app = FastAPI(title="YouTube Library Manager")
 
-# Enable CORS for development
+# Allow cross-origin calls only from the configured frontend origin(s)
+FRONTEND_ORIGINS = os.environ.get("FRONTEND_ORIGIN", "http://localhost:8000").split(",")
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=[origin.strip() for origin in FRONTEND_ORIGINS],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+class TextGZipMiddleware(GZipMiddleware):
+    """GZip text responses, passing already-compressed video and images through"""
+
+    MEDIA_PATH_PREFIXES = ("/api/stream", "/api/thumbnail")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.MEDIA_PATH_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress HTML/CSS/JS and JSON responses
+app.add_middleware(TextGZipMiddleware, minimum_size=500)
+
+# Frontend assets (HTML, CSS, JS)
+STATIC_DIR = Path(__file__).parent / "static"
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
 # Initialize download manager
 manager = YouTubeDownloadManager(base_path="./youtube_media", db_path="./youtube_library.db")
 
+# Shared read connections so requests don't pay for connect/close each time
+DB_POOL_SIZE = 8
+
+def open_db_connection() -> sqlite3.Connection:
+    """Open a pooled connection in WAL mode so reads don't block downloads"""
+    conn = sqlite3.connect(manager.db_path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+connection_pool = queue.Queue(maxsize=DB_POOL_SIZE)
+for _ in range(DB_POOL_SIZE):
+    connection_pool.put(open_db_connection())
+
+@contextmanager
+def get_conn():
+    """Borrow a connection from the pool for the duration of a block"""
+    conn = connection_pool.get()
+    try:
+        yield conn
+    finally:
+        connection_pool.put(conn)
+
 # Pydantic models for API
 class VideoDownloadRequest(BaseModel):
     url: HttpUrl
@@ -50,514 +111,272 @@ class DownloadResponse(BaseModel):
     message: str
     task_id: Optional[str] = None
 
-# In-memory task tracking (in production, use Redis or similar)
-download_tasks = {}
+# Read size when streaming video ranges from Python
+STREAM_CHUNK_SIZE = 1024 * 1024
 
-# API Routes
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    """Serve the main web interface"""
-    return """
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>YouTube Library Manager</title>
-        <style>
-            * { margin: 0; padding: 0; box-sizing: border-box; }
-            body {
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-                padding: 20px;
-            }
-            .container {
-                max-width: 1200px;
-                margin: 0 auto;
-                background: white;
-                border-radius: 20px;
-                box-shadow: 0 20px 60px rgba(0,0,0,0.3);
-                overflow: hidden;
-            }
-            .header {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 30px;
-                text-align: center;
-            }
-            .header h1 { font-size: 2.5em; margin-bottom: 10px; }
-            .tabs {
-                display: flex;
-                background: #f5f5f5;
-                border-bottom: 2px solid #ddd;
-            }
-            .tab {
-                flex: 1;
-                padding: 15px;
-                text-align: center;
-                cursor: pointer;
-                background: #f5f5f5;
-                border: none;
-                font-size: 16px;
-                font-weight: 600;
-                transition: all 0.3s;
-            }
-            .tab:hover { background: #e0e0e0; }
-            .tab.active {
-                background: white;
-                border-bottom: 3px solid #667eea;
-                color: #667eea;
-            }
-            .content {
-                padding: 30px;
-            }
-            .tab-content { display: none; }
-            .tab-content.active { display: block; }
-            .form-group {
-                margin-bottom: 20px;
-            }
-            label {
-                display: block;
-                margin-bottom: 8px;
-                font-weight: 600;
-                color: #333;
-            }
-            input[type="text"], textarea {
-                width: 100%;
-                padding: 12px;
-                border: 2px solid #ddd;
-                border-radius: 8px;
-                font-size: 16px;
-                transition: border 0.3s;
-            }
-            input[type="text"]:focus, textarea:focus {
-                outline: none;
-                border-color: #667eea;
-            }
-            .btn {
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 12px 30px;
-                border: none;
-                border-radius: 8px;
-                font-size: 16px;
-                font-weight: 600;
-                cursor: pointer;
-                transition: transform 0.2s;
-            }
-            .btn:hover {
-                transform: translateY(-2px);
-                box-shadow: 0 5px 15px rgba(102, 126, 234, 0.4);
-            }
-            .status {
-                margin-top: 20px;
-                padding: 15px;
-                border-radius: 8px;
-                display: none;
-            }
-            .status.success {
-                background: #d4edda;
-                color: #155724;
-                border: 1px solid #c3e6cb;
-            }
-            .status.error {
-                background: #f8d7da;
-                color: #721c24;
-                border: 1px solid #f5c6cb;
-            }
-            .video-grid {
-                display: grid;
-                grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-                gap: 20px;
-                margin-top: 20px;
-            }
-            .video-card {
-                background: white;
-                border: 1px solid #ddd;
-                border-radius: 12px;
-                overflow: hidden;
-                transition: transform 0.3s, box-shadow 0.3s;
-                cursor: pointer;
-            }
-            .video-card:hover {
-                transform: translateY(-5px);
-                box-shadow: 0 10px 25px rgba(0,0,0,0.1);
-            }
-            .video-thumbnail {
-                width: 100%;
-                height: 180px;
-                object-fit: cover;
-                background: #f0f0f0;
-            }
-            .video-info {
-                padding: 15px;
-            }
-            .video-title {
-                font-weight: 600;
-                margin-bottom: 8px;
-                color: #333;
-                display: -webkit-box;
-                -webkit-line-clamp: 2;
-                -webkit-box-orient: vertical;
-                overflow: hidden;
-            }
-            .video-uploader {
-                color: #666;
-                font-size: 14px;
-            }
-            .filter-bar {
-                display: flex;
-                gap: 15px;
-                margin-bottom: 20px;
-                flex-wrap: wrap;
-            }
-            .filter-bar input, .filter-bar select {
-                flex: 1;
-                min-width: 200px;
-            }
-            .badge {
-                display: inline-block;
-                padding: 4px 8px;
-                background: #667eea;
-                color: white;
-                border-radius: 4px;
-                font-size: 12px;
-                margin-right: 5px;
-            }
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1>📺 YouTube Library Manager</h1>
-                <p>Download and organize your YouTube content</p>
-            </div>
-            
-            <div class="tabs">
-                <button class="tab active" onclick="switchTab('download')">⬇️ Download</button>
-                <button class="tab" onclick="switchTab('videos')">🎬 Videos</button>
-                <button class="tab" onclick="switchTab('shorts')">📱 Shorts</button>
-                <button class="tab" onclick="switchTab('playlists')">📋 Playlists</button>
-            </div>
-            
-            <div class="content">
-                <!-- Download Tab -->
-                <div id="download" class="tab-content active">
-                    <h2>Download Content</h2>
-                    
-                    <div class="form-group">
-                        <label for="video-url">YouTube URL:</label>
-                        <input type="text" id="video-url" 
-                               placeholder="https://www.youtube.com/watch?v=... or playlist link">
-                    </div>
-                    
-                    <div class="form-group">
-                        <label for="tags">Tags (comma-separated):</label>
-                        <input type="text" id="tags" 
-                               placeholder="e.g., Tutorial, Python, Programming">
-                    </div>
-                    
-                    <button class="btn" onclick="downloadContent()">⬇️ Download</button>
-                    
-                    <div id="download-status" class="status"></div>
-                </div>
-                
-                <!-- Videos Tab -->
-                <div id="videos" class="tab-content">
-                    <h2>Regular Videos</h2>
-                    
-                    <div class="filter-bar">
-                        <input type="text" id="video-search" 
-                               placeholder="Search videos..." 
-                               oninput="filterVideos(false)">
-                        <select id="video-sort" onchange="filterVideos(false)">
-                            <option value="recent">Most Recent</option>
-                            <option value="title">Title (A-Z)</option>
-                            <option value="uploader">Uploader</option>
-                        </select>
-                    </div>
-                    
-                    <div id="videos-grid" class="video-grid">
-                        <!-- Videos will be loaded here -->
-                    </div>
-                </div>
-                
-                <!-- Shorts Tab -->
-                <div id="shorts" class="tab-content">
-                    <h2>YouTube Shorts</h2>
-                    
-                    <div class="filter-bar">
-                        <input type="text" id="shorts-search" 
-                               placeholder="Search shorts..." 
-                               oninput="filterVideos(true)">
-                    </div>
-                    
-                    <div id="shorts-grid" class="video-grid">
-                        <!-- Shorts will be loaded here -->
-                    </div>
-                </div>
-                
-                <!-- Playlists Tab -->
-                <div id="playlists" class="tab-content">
-                    <h2>Playlists</h2>
-                    <div id="playlists-list">
-                        <!-- Playlists will be loaded here -->
-                    </div>
-                </div>
-            </div>
-        </div>
+@lru_cache(maxsize=4096)
+def guess_mime(path_str: str) -> str:
+    """Media type for a video file (yt-dlp may produce mp4, webm or mkv)"""
+    return mimetypes.guess_type(path_str)[0] or "application/octet-stream"
+
+# Most bytes sent for a single range request
+MAX_RANGE = 4 * 1024 * 1024
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
+# Behind nginx, set this to an internal location mapped to the media folder
+# (e.g. "/protected-media") so nginx sends the file itself with sendfile
+ACCEL_REDIRECT_PREFIX = os.environ.get("ACCEL_REDIRECT_PREFIX")
+
+def accel_redirect_path(video_path: Path) -> Optional[str]:
+    """Map a media file to its internal nginx URI, if it lives under the media folder"""
+    try:
+        relative = video_path.resolve().relative_to(manager.base_path.resolve())
+    except ValueError:
+        return None
+    return f"{ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(relative.as_posix())}"
+
+# Key for signing stream tokens; set it to keep tokens valid across restarts
+STREAM_TOKEN_SECRET = os.environ.get("STREAM_TOKEN_SECRET", "").encode() or secrets.token_bytes(32)
+
+def sign_stream_payload(video_id: int, payload: str) -> str:
+    """HMAC binding an encoded file path to a video id"""
+    message = f"{video_id}:{payload}".encode()
+    return hmac.new(STREAM_TOKEN_SECRET, message, hashlib.sha256).hexdigest()
+
+def make_stream_url(video_id: int, file_path: Optional[str]) -> str:
+    """Build a stream URL that carries the video's file path in a signed token"""
+    if not file_path:
+        return f"/api/stream-by-id/{video_id}"
+    payload = base64.urlsafe_b64encode(file_path.encode()).decode().rstrip("=")
+    token = f"{payload}.{sign_stream_payload(video_id, payload)}"
+    return f"/api/stream-by-id/{video_id}?token={token}"
+
+def read_stream_token(video_id: int, token: str) -> Optional[str]:
+    """Return the file path from a stream token, or None if it doesn't verify"""
+    payload, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(signature, sign_stream_payload(video_id, payload)):
+        return None
+    try:
+        return base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)).decode()
+    except ValueError:
+        return None
+
+# Thumbnails never change once downloaded, so browsers can keep them for a year
+THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# In-memory task tracking, shared between request handlers and download
+# threads. State is per process, so run a single uvicorn worker.
+MAX_TRACKED_TASKS = 500
+download_tasks = OrderedDict()
+download_tasks_lock = threading.Lock()
+
+# Downloads run on their own threads, so a burst of requests waits in this
+# queue instead of taking the threadpool the API's sync handlers run on
+MAX_CONCURRENT_DOWNLOADS = int(os.environ.get("MAX_CONCURRENT_DOWNLOADS", "2"))
+download_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS, thread_name_prefix="download")
+
+def create_task(task_type: str, url: str) -> str:
+    """Register a new download task and return its id"""
+    task_id = uuid.uuid4().hex
+    with download_tasks_lock:
+        download_tasks[task_id] = {
+            "task_id": task_id,
+            "type": task_type,
+            "url": url,
+            "status": "queued",
+            "message": "Waiting to start",
+            "created_date": datetime.now().isoformat()
+        }
         
-        <script>
-            function switchTab(tabName) {
-                // Hide all tabs
-                document.querySelectorAll('.tab-content').forEach(tab => {
-                    tab.classList.remove('active');
-                });
-                document.querySelectorAll('.tab').forEach(tab => {
-                    tab.classList.remove('active');
-                });
-                
-                // Show selected tab
-                document.getElementById(tabName).classList.add('active');
-                event.target.classList.add('active');
-                
-                // Load content for the tab
-                if (tabName === 'videos') loadVideos(false);
-                if (tabName === 'shorts') loadVideos(true);
-                if (tabName === 'playlists') loadPlaylists();
-            }
-            
-            async function downloadContent() {
-                const url = document.getElementById('video-url').value;
-                const tags = document.getElementById('tags').value.split(',').map(t => t.trim());
-                const statusDiv = document.getElementById('download-status');
-                
-                if (!url) {
-                    showStatus('error', 'Please enter a URL');
-                    return;
-                }
-                
-                statusDiv.style.display = 'block';
-                statusDiv.className = 'status';
-                statusDiv.textContent = 'Downloading... This may take a while.';
-                
-                try {
-                    const endpoint = url.includes('playlist') ? '/api/download-playlist' : '/api/download-video';
-                    const response = await fetch(endpoint, {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ url, tags })
-                    });
-                    
-                    const result = await response.json();
-                    
-                    if (result.status === 'success') {
-                        showStatus('success', result.message || 'Download started successfully!');
-                        document.getElementById('video-url').value = '';
-                        document.getElementById('tags').value = '';
-                    } else {
-                        showStatus('error', result.message || 'Download failed');
-                    }
-                } catch (error) {
-                    showStatus('error', 'Error: ' + error.message);
-                }
-            }
-            
-            function showStatus(type, message) {
-                const statusDiv = document.getElementById('download-status');
-                statusDiv.style.display = 'block';
-                statusDiv.className = 'status ' + type;
-                statusDiv.textContent = message;
-            }
-            
-            async function loadVideos(isShort) {
-                const gridId = isShort ? 'shorts-grid' : 'videos-grid';
-                const grid = document.getElementById(gridId);
-
-                // Show loading state
-                grid.innerHTML = '<p style="padding: 20px; text-align: center;">Loading...</p>';
-                
-                try {
-                    const response = await fetch(`/api/videos?is_short=${isShort}`);
-                    if (!response.ok) {
-                        throw new Error(`HTTP error! status: ${response.status}`);
-                    }
-
-                    const videos = await response.json();
-                    if (video.length === 0) {
-                        grid.innerHTML = '<p style="padding: 20px; text-align: center; color: #666;">No videos yet. Download some to get started!</p>';
-                        return;
-                    }
-                    
-                    grid.innerHTML = videos.map(video => `
-                        <div class="video-card" onclick="playVideo('${video.id}')">
-                            <img class="video-thumbnail" 
-                                 src="/api/thumbnail/${video.id}" 
-                                 alt="${video.title}"
-                                 onerror="this.src='data:image/svg+xml,%3Csvg xmlns=\\'http://www.w3.org/2000/svg\\' width=\\'100\\' height=\\'100\\'%3E%3Crect fill=\\'%23ddd\\' width=\\'100\\' height=\\'100\\'/%3E%3C/svg%3E'">
-                            <div class="video-info">
-                                <div class="video-title">${video.title}</div>
-                                <div class="video-uploader">${video.uploader}</div>
-                                ${isShort ? '<span class="badge">Short</span>' : ''}
-                            </div>
-                        </div>
-                    `).join('');
-                } catch (error) {
-                    grid.innerHTML = '<p>Error loading videos: ' + error.message + '</p>';
-                }
-            }
-            
-            async function loadPlaylists() {
-                const list = document.getElementById('playlists-list');
-                
-                try {
-                    const response = await fetch('/api/playlists');
-                    const playlists = await response.json();
-                    
-                    list.innerHTML = playlists.map(playlist => `
-                        <div style="padding: 20px; border: 1px solid #ddd; border-radius: 8px; margin-bottom: 15px;">
-                            <h3>${playlist.name}</h3>
-                            <p>${playlist.description || 'No description'}</p>
-                            <small>Created: ${new Date(playlist.created_date).toLocaleDateString()}</small>
-                        </div>
-                    `).join('');
-                } catch (error) {
-                    list.innerHTML = '<p>Error loading playlists</p>';
-                }
-            }
+        # Forget the oldest finished tasks so the dict doesn't grow forever
+        if len(download_tasks) > MAX_TRACKED_TASKS:
+            finished = [
+                old_id for old_id, task in download_tasks.items()
+                if task["status"] in ("completed", "error")
+            ]
+            for old_id in finished[:len(download_tasks) - MAX_TRACKED_TASKS]:
+                del download_tasks[old_id]
+    return task_id
 
-            function filterVideos(isShort) {
-                const searchId = isShort ? 'shorts-search' : 'video-search';
-                const sortId = isShort ? null : 'video-sort';
-                const gridId = isShort ? 'shorts-grid' : 'videos-grid';
-                
-                const searchQuery = document.getElementById(searchId).value.toLowerCase();
-                const sortBy = sortId ? document.getElementById(sortId).value : 'recent';
-                
-                // Fetch and filter videos
-                fetch(`/api/videos?is_short=${isShort}`)
-                    .then(res => res.json())
-                    .then(videos => {
-                        // Filter by search query
-                        let filtered = videos.filter(v => 
-                            v.title.toLowerCase().includes(searchQuery) ||
-                            v.uploader.toLowerCase().includes(searchQuery)
-                        );
-                        
-                        // Sort
-                        if (sortBy === 'title') {
-                            filtered.sort((a, b) => a.title.localeCompare(b.title));
-                        } else if (sortBy === 'uploader') {
-                            filtered.sort((a, b) => a.uploader.localeCompare(b.uploader));
-                        } else {
-                            // Most recent (default)
-                            filtered.sort((a, b) => new Date(b.download_date) - new Date(a.download_date));
-                        }
-                        
-                        // Render filtered results
-                        const grid = document.getElementById(gridId);
-                        grid.innerHTML = filtered.map(video => `
-                            <div class="video-card" onclick="playVideo('${video.file_path}')">
-                                <img class="video-thumbnail" 
-                                    src="/api/thumbnail/${video.id}" 
-                                    alt="${video.title}"
-                                    onerror="this.src='data:image/svg+xml,%3Csvg xmlns=\\'http://www.w3.org/2000/svg\\' width=\\'100\\' height=\\'100\\'%3E%3Crect fill=\\'%23ddd\\' width=\\'100\\' height=\\'100\\'/%3E%3C/svg%3E'">
-                                <div class="video-info">
-                                    <div class="video-title">${video.title}</div>
-                                    <div class="video-uploader">${video.uploader}</div>
-                                    ${isShort ? '<span class="badge">Short</span>' : ''}
-                                </div>
-                            </div>
-                        `).join('');
-                    });
-            }
-            
-            function playVideo(videoId) {
-                // Open video in new window or implement custom player
-                // Encode the entire path properly for special characters
-                // const encodedPath = encodeURIComponent(filePath);
-                // window.open(`/api/stream/${encodedPath}`, '_blank');
-                window.open(`/api/stream-by-id/${videoId}`, '_blank');
-            }
-            
-            // Load videos on initial page load
-            // loadVideos(false);
-        </script>
-    </body>
-    </html>
+def update_task(task_id: str, **fields):
+    """Update a task's fields atomically"""
+    with download_tasks_lock:
+        download_tasks[task_id].update(fields)
+
+def get_task_snapshot(task_id: str) -> Optional[dict]:
+    """Copy of a task's current state, or None if unknown"""
+    with download_tasks_lock:
+        task = download_tasks.get(task_id)
+        return dict(task) if task else None
+
+def find_active_task(url: str) -> Optional[str]:
+    """Return the id of a queued or running task for this URL, if any"""
+    with download_tasks_lock:
+        for task in download_tasks.values():
+            if task["url"] == url and task["status"] in ("queued", "running"):
+                return task["task_id"]
+    return None
+
+def run_download_task(task_id: str, download_func, url: str, tags: Optional[List[str]]):
+    """Run a download outside the request and record the outcome.
+
+    Runs on download_executor, so yt-dlp never blocks the event loop or
+    Starlette's threadpool.
     """
+    update_task(task_id, status="running", message="Downloading...")
 
-@app.post("/api/download-video")
-async def download_video(request: VideoDownloadRequest, background_tasks: BackgroundTasks):
-    """Download a single video"""
     try:
-        # In production, run this in background
-        background_tasks.add_task(manager.download_video, str(request.url), request.tags)
-        
-        # For now, download synchronously (replace with background task in production)
-        result = manager.download_video(str(request.url), request.tags)
-        
-        if result['status'] == 'success':
-            return {
-                "status": "success",
-                "message": f"Successfully downloaded: {result['title']}"
-            }
+        result = download_func(url, tags)
+    except Exception as e:
+        result = {"status": "error", "message": str(e)}
+
+    if result.get("status") == "success":
+        # New videos change the library stats
+        _stats_cache["ts"] = 0
+        if "playlist_name" in result:
+            message = f"Playlist downloaded: {result['playlist_name']} ({result['total_videos']} videos)"
         else:
+            message = f"Successfully downloaded: {result['title']}"
+        update_task(task_id, status="completed", message=message)
+    else:
+        update_task(task_id, status="error", message=result.get("message", "Download failed"))
+
+# API Routes
+@app.get("/")
+async def root():
+    """Serve the main web interface"""
+    return FileResponse(STATIC_DIR / "index.html")
+
+@app.post("/api/download-video", response_model=DownloadResponse)
+async def download_video(request: VideoDownloadRequest):
+    """Queue a single video download"""
+    try:
+        # Don't fetch the same video twice while it is still downloading
+        active_task_id = find_active_task(str(request.url))
+        if active_task_id:
             return {
-                "status": "error",
-                "message": result.get('message', 'Download failed')
+                "status": "queued",
+                "message": "This video is already downloading",
+                "task_id": active_task_id
             }
+
+        task_id = create_task("video", str(request.url))
+        download_executor.submit(run_download_task, task_id, manager.download_video, str(request.url), request.tags)
+
+        return {
+            "status": "queued",
+            "message": "Download queued",
+            "task_id": task_id
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/download-playlist")
-async def download_playlist(request: PlaylistDownloadRequest, background_tasks: BackgroundTasks):
-    """Download entire playlist"""
+@app.post("/api/download-playlist", response_model=DownloadResponse)
+async def download_playlist(request: PlaylistDownloadRequest):
+    """Queue an entire playlist download"""
     try:
-        # Background task for long-running playlist downloads
-        background_tasks.add_task(manager.download_playlist, str(request.url), request.tags)
-        
-        result = manager.download_playlist(str(request.url), request.tags)
-        
+        active_task_id = find_active_task(str(request.url))
+        if active_task_id:
+            return {
+                "status": "queued",
+                "message": "This playlist is already downloading",
+                "task_id": active_task_id
+            }
+
+        # Playlists are long-running; they wait their turn in the download queue
+        task_id = create_task("playlist", str(request.url))
+        download_executor.submit(run_download_task, task_id, manager.download_playlist, str(request.url), request.tags)
+
         return {
-            "status": "success",
-            "message": f"Playlist download started: {result.get('playlist_name')}"
+            "status": "queued",
+            "message": "Playlist download queued",
+            "task_id": task_id
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/tasks/{task_id}")
+async def get_task(task_id: str):
+    """Get the status of a queued download"""
+    task = get_task_snapshot(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return task
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the browser's cached copy is still current"""
+    if_none_match = request.headers.get("if-none-match", "")
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
 @app.get("/api/videos")
-async def get_videos(is_short: bool = False):
-    """Get all videos or shorts"""
+def get_videos(
+        request: Request,
+        response: Response,
+        is_short: bool = False,
+        q: str = "",
+        sort: str = "recent",
+        limit: int = Query(50, ge=1, le=200),
+        offset: int = Query(0, ge=0)
+    ):
+    """Get one page of videos or shorts, filtered and sorted in SQL"""
+    if sort not in manager.VIDEO_SORTS:
+        raise HTTPException(status_code=400, detail=f"Unknown sort: {sort}")
+
     try:
-        videos = manager.get_all_videos(is_short=is_short)
+        # Any new or re-downloaded video bumps the max id or the count
+        with get_conn() as conn:
+            max_id, count = conn.execute(
+                "SELECT MAX(id), COUNT(*) FROM videos WHERE is_short = ?", (is_short,)
+            ).fetchone()
+        
+        etag = f'W/"{max_id}-{count}"'
+        if etag_matches(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        
+        videos = []
+        for row in manager.get_videos_page(is_short, query=q, sort=sort, limit=limit, offset=offset):
+            video = dict(row)
+            video["stream_url"] = make_stream_url(video["id"], video.pop("file_path"))
+            videos.append(video)
         return videos
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/playlists")
-async def get_playlists():
+def get_playlists(request: Request, response: Response):
     """Get all playlists"""
     try:
-        conn = sqlite3.connect(manager.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM playlists")
-        
-        columns = [description[0] for description in cursor.description]
-        playlists = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        with get_conn() as conn:
+            max_id, count = conn.execute("SELECT MAX(id), COUNT(*) FROM playlists").fetchone()
+            
+            etag = f'W/"{max_id}-{count}"'
+            if etag_matches(request, etag):
+                return Response(status_code=304, headers={"ETag": etag})
+            
+            rows = conn.execute("""
+                SELECT id, name, description, created_date
+                FROM playlists
+                ORDER BY created_date DESC
+                LIMIT 200
+            """).fetchall()
         
-        conn.close()
-        return playlists
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+        return [
+            {"id": row[0], "name": row[1], "description": row[2], "created_date": row[3]}
+            for row in rows
+        ]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/search")
-async def search_videos(q: str):
+def search_videos(q: str):
     """Search videos"""
     try:
-        results = manager.search_videos(q)
-        return results
+        return [dict(row) for row in manager.search_videos(q)]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -581,31 +400,60 @@ async def search_videos(q: str):
 #     except Exception as e:
 #         raise HTTPException(status_code=500, detail=str(e))
     
+@lru_cache(maxsize=10000)
+def resolve_thumb(video_id: int) -> Optional[Path]:
+    """Find a video's thumbnail file (cached, it never moves)"""
+    with get_conn() as conn:
+        result = conn.execute("SELECT thumbnail_path, file_path FROM videos WHERE id = ?", (video_id,)).fetchone()
+    
+    if not result:
+        return None
+    
+    # Path recorded at download time
+    if result[0] and "://" not in result[0]:
+        return Path(result[0])
+    
+    # Older rows stored the remote thumbnail URL instead
+    if result[1]:
+        # Look for thumbnail saved next to video file
+        video_path = Path(result[1])
+        video_dir = video_path.parent
+        video_name = video_path.stem  # filename without extension
+        
+        # Try common thumbnail extensions yt-dlp saves
+        for ext in ['.jpg', '.webp', '.png']:
+            thumb_path = video_dir / f"{video_name}{ext}"
+            if thumb_path.exists():
+                return thumb_path
+    
+    return None
+
 @app.get("/api/thumbnail/{video_id}")
-async def get_thumbnail(video_id: int):
+def get_thumbnail(video_id: int, request: Request):
     """Serve video thumbnail"""
     try:
-        conn = sqlite3.connect(manager.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT file_path FROM videos WHERE id = ?", (video_id,))
-        result = cursor.fetchone()
-        conn.close()
+        thumb_path = resolve_thumb(video_id)
         
-        if result and result[0]:
-            # Look for thumbnail saved next to video file
-            video_path = Path(result[0])
-            video_dir = video_path.parent
-            video_name = video_path.stem  # filename without extension
+        if thumb_path:
+            stat = thumb_path.stat()
+            headers = {
+                "Cache-Control": THUMBNAIL_CACHE_CONTROL,
+                "ETag": f'"{video_id}-{stat.st_mtime_ns}"'
+            }
             
-            # Try common thumbnail extensions yt-dlp saves
-            for ext in ['.jpg', '.webp', '.png']:
-                thumb_path = video_dir / f"{video_name}{ext}"
-                if thumb_path.exists():
-                    return FileResponse(thumb_path)
+            # Browser already has this exact thumbnail
+            if request.headers.get("if-none-match") == headers["ETag"]:
+                return Response(status_code=304, headers=headers)
+            
+            return FileResponse(thumb_path, headers=headers, stat_result=stat)
         
         # Not found - let browser use fallback gray box
         raise HTTPException(status_code=404, detail="Thumbnail not found")
         
+    except FileNotFoundError:
+        # Thumbnail was removed from disk; forget the stale cached paths
+        resolve_thumb.cache_clear()
+        raise HTTPException(status_code=404, detail="Thumbnail not found")
     except Exception as e:
         raise HTTPException(status_code=404, detail="Thumbnail not found")
 
@@ -615,30 +463,58 @@ async def stream_video(file_path: str, request: Request):
     try:
         video_path = Path(file_path)
         
-        if not video_path.exists():
+        # Stat in a worker thread so a cold disk doesn't stall other streams
+        try:
+            stat = await anyio.Path(video_path).stat()
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="Video not found")
         
+        # Let the reverse proxy do a zero-copy transfer when configured
+        if ACCEL_REDIRECT_PREFIX:
+            accel_path = accel_redirect_path(video_path)
+            if accel_path:
+                return Response(headers={"X-Accel-Redirect": accel_path})
+        
         # Get file size
-        file_size = video_path.stat().st_size
+        file_size = stat.st_size
         
         # Handle range requests for video seeking
         range_header = request.headers.get("range")
         
-        if range_header:
-            # Parse range header
-            range_match = range_header.replace("bytes=", "").split("-")
-            start = int(range_match[0])
-            end = int(range_match[1]) if range_match[1] else file_size - 1
+        range_match = _RANGE_RE.fullmatch(range_header.strip()) if range_header else None
+        
+        # Single byte ranges are served here; FileResponse rejects malformed
+        # headers and handles multi-part ranges below
+        if range_match and any(range_match.groups()):
+            start_str, end_str = range_match.groups()
+            if start_str:
+                start = int(start_str)
+                end = int(end_str) if end_str else file_size - 1
+            else:
+                # Suffix range: the last N bytes
+                start = max(file_size - int(end_str), 0)
+                end = file_size - 1
+            
+            if start >= file_size or start > end:
+                raise HTTPException(
+                    status_code=416,
+                    detail="Range not satisfiable",
+                    headers={"Content-Range": f"bytes */{file_size}"}
+                )
+            
+            # Bound each response; the player requests the next range as it plays
+            end = min(end, start + MAX_RANGE - 1, file_size - 1)
             
             # Read chunk
             chunk_size = end - start + 1
             
-            def iterfile():
-                with open(video_path, "rb") as f:
-                    f.seek(start)
+            async def iterfile():
+                # Async reads keep concurrent streams from blocking each other on disk I/O
+                async with await anyio.open_file(video_path, "rb") as f:
+                    await f.seek(start)
                     remaining = chunk_size
                     while remaining > 0:
-                        chunk = f.read(min(8192, remaining))
+                        chunk = await f.read(min(STREAM_CHUNK_SIZE, remaining))
                         if not chunk:
                             break
                         remaining -= len(chunk)
@@ -648,74 +524,84 @@ async def stream_video(file_path: str, request: Request):
                 "Content-Range": f"bytes {start}-{end}/{file_size}",
                 "Accept-Ranges": "bytes",
                 "Content-Length": str(chunk_size),
-                "Content-Type": "video/mp4",
+                "Content-Type": guess_mime(str(video_path)),
             }
             
             return StreamingResponse(iterfile(), status_code=206, headers=headers)
         
-        # No range request - serve entire file
+        # No range request - serve entire file, reusing the stat from above
         return FileResponse(
             video_path,
-            media_type="video/mp4",
-            headers={"Accept-Ranges": "bytes"}
+            media_type=guess_mime(str(video_path)),
+            stat_result=stat,
+            headers={"Accept-Ranges": "bytes", "Content-Length": str(stat.st_size)}
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Stats are polled often but only change when a download finishes
+STATS_TTL = 5
+_stats_cache = {"ts": 0, "val": None}
+
 @app.get("/api/stats")
-async def get_stats():
+def get_stats():
     """Get library statistics"""
+    if time.monotonic() - _stats_cache["ts"] < STATS_TTL:
+        return _stats_cache["val"]
+    
     try:
-        conn = sqlite3.connect(manager.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM videos WHERE is_short = 0")
-        video_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM videos WHERE is_short = 1")
-        shorts_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM playlists")
-        playlist_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT SUM(duration) FROM videos")
-        total_duration = cursor.fetchone()[0] or 0
+        # All four figures in one round trip
+        with get_conn() as conn:
+            video_count, shorts_count, playlist_count, total_duration = conn.execute("""
+                SELECT
+                    (SELECT COUNT(*) FROM videos WHERE is_short = 0),
+                    (SELECT COUNT(*) FROM videos WHERE is_short = 1),
+                    (SELECT COUNT(*) FROM playlists),
+                    (SELECT COALESCE(SUM(duration), 0) FROM videos)
+            """).fetchone()
         
-        conn.close()
-        
-        return {
+        stats = {
             "total_videos": video_count,
             "total_shorts": shorts_count,
             "total_playlists": playlist_count,
             "total_duration_seconds": total_duration,
             "total_duration_hours": round(total_duration / 3600, 2)
         }
+        _stats_cache["val"] = stats
+        _stats_cache["ts"] = time.monotonic()
+        return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
+def get_video_file_path(video_id: int):
+    """Fetch the file path row for a video"""
+    with get_conn() as conn:
+        return conn.execute("SELECT file_path FROM videos WHERE id = ?", (video_id,)).fetchone()
+
 @app.get("/api/stream-by-id/{video_id}")
-async def stream_by_id(video_id: int, request: Request):
+async def stream_by_id(video_id: int, request: Request, token: Optional[str] = None):
     """Stream video by database ID instead of file path"""
     try:
-        # Get file path from database
-        conn = sqlite3.connect(manager.db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT file_path FROM videos WHERE id = ?", (video_id,))
-        result = cursor.fetchone()
-        conn.close()
-        
-        if not result or not result[0]:
-            raise HTTPException(status_code=404, detail="Video not found")
-        
-        video_path = Path(result[0])
+        # A valid token from the video list already names the file
+        file_path = read_stream_token(video_id, token) if token else None
         
-        if not video_path.exists():
-            raise HTTPException(status_code=404, detail="Video file not found")
+        if file_path is None:
+            # Get file path from database without blocking the event loop
+            result = await run_in_threadpool(get_video_file_path, video_id)
+            
+            if not result or not result[0]:
+                raise HTTPException(status_code=404, detail="Video not found")
+            
+            file_path = result[0]
         
         # Use the existing streaming logic
-        return await stream_video(str(video_path), request)
+        return await stream_video(file_path, request)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
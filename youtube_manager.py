@@ -5,20 +5,195 @@ A system to download, organize, and manage YouTube videos
 
 from multiprocessing import managers
 import yt_dlp
+from yt_dlp.utils import ISO639Utils
 import json
 import sqlite3
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
+from contextlib import contextmanager
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import queue
 import re
+import shutil
+import subprocess
+import threading
+import time
+
+# URL marker for videos published as Shorts
+SHORT_URL_TOKEN = '/shorts/'
+# Characters not allowed in file names
+_INVALID_FN = re.compile(r'[<>:"/\\|?*]')
+
+# Write statements; the text never changes, so sqlite3 reuses the prepared statements
+INSERT_VIDEO_SQL = """
+    INSERT OR REPLACE INTO videos
+    (video_id, title, uploader, upload_date, duration, description,
+     view_count, is_short, file_path, thumbnail_path, download_date,
+     original_url, status)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+INSERT_TAG_SQL = "INSERT INTO tags (video_id, tag) VALUES (?, ?)"
+# Playlist linking stages (YouTube id, position) pairs in a temp table and
+# resolves them to row ids with one join
+CREATE_NEW_ENTRIES_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS new_entries (video_id TEXT, position INTEGER)
+"""
+INSERT_NEW_ENTRY_SQL = "INSERT INTO temp.new_entries (video_id, position) VALUES (?, ?)"
+INSERT_PLAYLIST_ITEMS_SQL = """
+    INSERT INTO playlist_items (playlist_id, videos_id, position)
+    SELECT ?, v.id, t.position
+    FROM temp.new_entries t
+    JOIN videos v ON v.video_id = t.video_id
+"""
+
+class TokenBucket:
+    """Bandwidth cap shared by every download thread"""
+
+    def __init__(self, rate_bytes_per_s: int, capacity: int):
+        self.rate = rate_bytes_per_s
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: int):
+        """Take tokens for `amount` bytes, sleeping until the bucket can pay for them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Go into debt and sleep it off, so later callers queue up behind us
+            self._tokens -= amount
+            deficit = -self._tokens
+
+        if deficit > 0:
+            time.sleep(deficit / self.rate)
 
 class YouTubeDownloadManager:
-    def __init__(self, base_path: str = "./media", db_path: str = "./youtube_library.db"):
+    # Whitelisted ORDER BY clauses for get_videos_page
+    VIDEO_SORTS = {
+        'recent': 'v.download_date DESC',
+        'title': 'v.title COLLATE NOCASE',
+        'uploader': 'v.uploader COLLATE NOCASE, v.title COLLATE NOCASE',
+    }
+
+    # Extracted info holds signed format URLs that expire after a few hours,
+    # so cached metadata is only reused for a short while
+    META_CACHE_TTL = 3600
+
+    # Concurrent metadata extractions when preparing a playlist
+    METADATA_WORKERS = 8
+
+    # Subtitle codec ffmpeg should use when embedding into each container
+    SUBTITLE_CODECS = {
+        'mp4': 'mov_text',
+        'm4v': 'mov_text',
+        'mov': 'mov_text',
+        'mkv': 'srt',
+        'webm': 'webvtt',
+    }
+
+    def __init__(
+            self,
+            base_path: str = "./media",
+            db_path: str = "./youtube_library.db",
+            max_parallel_videos: int = 4,
+            use_aria2c: bool = True,
+            download_rate: Optional[int] = 20_000_000,
+            download_burst: int = 40_000_000
+        ):
         self.base_path = Path(base_path)
         self.db_path = db_path
+        # How many playlist videos download at once (sharing one bandwidth cap)
+        self.max_parallel_videos = max_parallel_videos
+
+        # aria2c opens several connections per file, which gets around YouTube's
+        # per-connection throttling. yt-dlp gets no progress from it, so the
+        # shared bandwidth cap can't throttle it: only use it when the cap is
+        # off (download_rate=None), and fall back to yt-dlp's downloader otherwise
+        self.use_aria2c = use_aria2c and download_rate is None and shutil.which('aria2c') is not None
+        if use_aria2c and download_rate is None and not self.use_aria2c:
+            print("aria2c not found, using yt-dlp's built-in downloader")
+
+        # Total download bandwidth across all concurrent downloads (bytes/s),
+        # enforced from progress_hook; a lone download can use all of it
+        self._bucket = TokenBucket(download_rate, download_burst) if download_rate else None
+        # filename -> (downloaded_bytes, total_bytes, speed) for downloads in
+        # flight; bytes seen here are already charged to the bucket
+        self._progress = {}
+        self._progress_lock = threading.Lock()
+        # One thread draws progress so download workers never wait on stdout;
+        # other output goes through _log, which ends the status line first
+        self._status_line = ''
+        self._stdout_lock = threading.Lock()
+        threading.Thread(target=self._render_progress, daemon=True).start()
+
+        # One shared connection; SQLite serializes writers anyway, so guard it
+        # with a lock and manage transactions explicitly (isolation_level=None)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        # Rows support row['title'] without building a dict per row
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.execute("PRAGMA temp_store = MEMORY")
+        self._conn.execute("PRAGMA cache_size = -20000")
+        # REPLACE deletes the old row; fire the delete trigger so search stays in sync
+        self._conn.execute("PRAGMA recursive_triggers = ON")
+
+        # is_short -> (version, rows) for get_all_videos; saves bump the version
+        self._videos_version = 0
+        self._videos_cache = {}
+
+        # url -> (extracted_at, info) from recent metadata extractions
+        self._meta_cache = {}
+        self._meta_cache_lock = threading.Lock()
+
+        # Subtitles are embedded in the background so the next download can start
+        self._pp_queue = queue.Queue()
+        # video_id -> Event set once that video's subtitles are embedded
+        self._pp_pending = {}
+
+        # output template -> video_id for downloads in flight, so concurrent
+        # downloads never write the same file
+        self._active_outputs = {}
+        self._active_outputs_cond = threading.Condition()
+        threading.Thread(target=self._pp_worker, daemon=True).start()
+
         self.setup_directories()
         self.setup_database()
 
+    def close(self):
+        """Finish pending subtitle embedding, then close the database connection"""
+        # The postprocessing worker is a daemon thread; wait for it so exiting
+        # doesn't kill ffmpeg mid-write and leave .temp files behind
+        self._pp_queue.join()
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextmanager
+    def transaction(self):
+        """Run a block of writes as one transaction (one fsync) on the shared connection"""
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            else:
+                cursor.execute("COMMIT")
+
     def setup_directories(self):
         """Create necessary folder structure"""
         (self.base_path / "videos").mkdir(parents=True, exist_ok=True)
@@ -27,8 +202,9 @@ class YouTubeDownloadManager:
 
     def setup_database(self):
         """Initialize SQLite database for metadata"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        # Runs from __init__ before the connection is shared, so no lock needed
+        cursor = self._conn.cursor()
+        cursor.execute("BEGIN")
 
         # Main videos table
         cursor.execute("""
@@ -82,32 +258,160 @@ class YouTubeDownloadManager:
             )
         """)
 
-        conn.commit()
-        conn.close()
+        # Index for the Videos/Shorts tabs (filter by type, newest first)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_videos_is_short_date
+            ON videos(is_short, download_date DESC)
+        """)
+
+        # Index for status lookups (completed videos of either type)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_videos_status_short
+            ON videos(status, is_short)
+        """)
+
+        # Full-text index over title and uploader for search
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'videos_fts'")
+        fts_exists = cursor.fetchone() is not None
+
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts
+            USING fts5(title, uploader, content='videos', content_rowid='id', tokenize='unicode61')
+        """)
+
+        # Keep the full-text index in sync with the videos table
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS videos_ai AFTER INSERT ON videos BEGIN
+                INSERT INTO videos_fts (rowid, title, uploader)
+                VALUES (new.id, new.title, new.uploader);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS videos_ad AFTER DELETE ON videos BEGIN
+                INSERT INTO videos_fts (videos_fts, rowid, title, uploader)
+                VALUES ('delete', old.id, old.title, old.uploader);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS videos_au AFTER UPDATE ON videos BEGIN
+                INSERT INTO videos_fts (videos_fts, rowid, title, uploader)
+                VALUES ('delete', old.id, old.title, old.uploader);
+                INSERT INTO videos_fts (rowid, title, uploader)
+                VALUES (new.id, new.title, new.uploader);
+            END
+        """)
+
+        # Index videos that were downloaded before the FTS table existed
+        if not fts_exists:
+            cursor.execute("INSERT INTO videos_fts (videos_fts) VALUES ('rebuild')")
 
-    def sanitize_filename(self, filename: str) -> str:
+        cursor.execute("COMMIT")
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def sanitize_filename(filename: str) -> str:
         """Remove invalid characters from filename"""
         # Replace invalid characters
-        filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+        filename = _INVALID_FN.sub('', filename)
         # Limit length
         return filename[:200]
 
+    def build_search_query(self, query: str, prefix: bool = False) -> str:
+        """Turn free text into an FTS5 query matching every word"""
+        # Quote each word so FTS5 operators and punctuation are taken literally
+        words = re.findall(r'\w+', query)
+        suffix = '*' if prefix else ''
+        return ' '.join(f'"{word}"{suffix}' for word in words)
+
     def is_youtube_short(self, info: dict) -> bool :
         """Determine if video is a YouTube Short"""
         # Shorts are typically <60 seconds and have specific aspect ratio
-        duration = info.get('duration', 0)
-        width = info.get('width', 0)
-        height = info.get('height', 0)
-
-        # Check duration and aspect ration (9:16 for shorts)
-        is_short_duration = duration and duration <= 60
-        is_vertical = height > width if (height and width) else False
-
-        # Also check URL pattern
-        url = info.get('web_page_url', '')
-        is_short_url = '/shorts/' in url
+        # (9:16), or are published under a /shorts/ URL
+        duration = info.get('duration') or 0
+        width = info.get('width') or 0
+        height = info.get('height') or 0
+        url = info.get('webpage_url') or ''
+
+        return SHORT_URL_TOKEN in url or (0 < duration <= 60 and height > width)
+
+    def find_thumbnail_file(self, info: dict) -> Optional[str]:
+        """Return the thumbnail file yt-dlp wrote for this video, if any"""
+        # yt-dlp records the written file on the thumbnail entry it saved
+        for thumbnail in reversed(info.get('thumbnails') or []):
+            if thumbnail.get('filepath'):
+                return thumbnail['filepath']
+        return None
+
+    def _extract_info(self, url: str) -> Dict:
+        """Extract video metadata without downloading"""
+        ydl_info_opts = {
+            'quiet': True,
+            'no_warnings': True
+        }
 
-        return is_short_url or (is_short_duration and is_vertical)
+        with yt_dlp.YoutubeDL(ydl_info_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+
+    def _get_info(self, url: str) -> Dict:
+        """Extract video metadata, reusing a recent extraction of the same URL"""
+        now = time.monotonic()
+        with self._meta_cache_lock:
+            cached = self._meta_cache.get(url)
+            if cached and now - cached[0] < self.META_CACHE_TTL:
+                return cached[1]
+
+        info = self._extract_info(url)
+
+        with self._meta_cache_lock:
+            # Drop stale entries so the cache doesn't grow without bound
+            self._meta_cache = {
+                key: entry for key, entry in self._meta_cache.items()
+                if now - entry[0] < self.META_CACHE_TTL
+            }
+            self._meta_cache[url] = (now, info)
+
+        return info
+
+    def _take_info(self, url: str) -> Dict:
+        """Metadata for a URL about to be downloaded, taken out of the cache"""
+        # The caller owns the dict from here on, and the cache doesn't keep
+        # the (often large) info of videos that are already downloaded
+        with self._meta_cache_lock:
+            cached = self._meta_cache.pop(url, None)
+        if cached and time.monotonic() - cached[0] < self.META_CACHE_TTL:
+            return cached[1]
+        return self._extract_info(url)
+
+    def _prefetch_info(self, url: str):
+        """Warm the metadata cache for a URL, ignoring failures"""
+        try:
+            self._get_info(url)
+        except Exception:
+            # download_video extracts again and reports the error
+            pass
+
+    def _claim_output(self, output_dir: Path, title: str, video_id: str) -> str:
+        """Reserve an output template no other in-flight download is writing"""
+        output_template = str(output_dir / f"{title}.%(ext)s")
+        with self._active_outputs_cond:
+            while True:
+                owner = self._active_outputs.get(output_template)
+                if owner is None:
+                    self._active_outputs[output_template] = video_id
+                    return output_template
+                if owner == video_id:
+                    # Same video (e.g. listed twice in a playlist): wait, and
+                    # yt-dlp will find it already downloaded
+                    self._active_outputs_cond.wait()
+                else:
+                    # Different video with the same title and uploader
+                    output_template = str(output_dir / f"{title} [{video_id}].%(ext)s")
+
+    def _release_output(self, output_template: str):
+        """Free an output template reserved by _claim_output"""
+        with self._active_outputs_cond:
+            self._active_outputs.pop(output_template, None)
+            self._active_outputs_cond.notify_all()
 
     def download_video(
             self,
@@ -118,16 +422,10 @@ class YouTubeDownloadManager:
         """Download a single video and save metadata"""
 
         # First, extract info without downloading
-        ydl_info_opts = {
-            'quiet': True,
-            'no_warnings': True
-        }
-
-        with yt_dlp.YoutubeDL(ydl_info_opts) as ydl:
-            try:
-                info = ydl.extract_info(url, download=False)
-            except Exception as e:
-                return {'status': 'error', 'message': str(e)}
+        try:
+            info = self._take_info(url)
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
 
         # Determine if short or regular video
         is_short = self.is_youtube_short(info)
@@ -140,7 +438,7 @@ class YouTubeDownloadManager:
         output_dir = self.base_path / video_type / uploader
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        output_template = str(output_dir / f"{title}.%(ext)s")
+        output_template = self._claim_output(output_dir, title, info.get('id'))
 
         # Scenario 1: Maximum quality under 1080p (recommended for Pi)
         # 'format': 'bestvideo[height<=1080]+bestaudio/best[height<=1080]'
@@ -158,11 +456,23 @@ class YouTubeDownloadManager:
         # 'format': 'bestvideo+bestaudio/best'
 
 
+        # Files this call downloads, so their progress entries can be dropped
+        # even when yt-dlp fails mid-transfer and never reports 'finished'
+        started_files = set()
+
+        def track_progress(d):
+            started_files.add(d.get('filename'))
+            self.progress_hook(d)
+
         # Download options
         ydl_opts = {
-            'format': 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080]', # Limit to 1080p max (saves bandwidth & storage)
-            'concurrent_fragment_downloads': 1, # Don't overwhelm the Pi
-            'ratelimit': 5000000, # 5MB/s limit (optiona, prevents network congestion)
+            # Limit to 1080p max (saves bandwidth & storage); prefer H.264/AAC so
+            # the streams merge into MP4 without re-encoding, or a pre-merged MP4
+            'format': 'bv*[height<=1080][vcodec^=avc1]+ba[ext=m4a]/b[height<=1080][ext=mp4]/b[height<=1080]',
+            'format_sort': ['res:1080', 'ext:mp4:m4a', 'vcodec:h264', 'acodec:aac'],
+            'merge_output_format': 'mp4',
+            'concurrent_fragment_downloads': 4, # Fetch DASH/HLS fragments in parallel
+            'ratelimit': None, # Bandwidth is capped across all downloads by self._bucket
             'outtmpl': output_template,
             'writethumbnail': True,
             'writeinfojson': False,
@@ -173,23 +483,53 @@ class YouTubeDownloadManager:
                 #     'key': 'FFmpegVideoConvertor',
                 #     'preferedformat': 'mp4',
                 # },
-                {
-                    'key': 'FFmpegEmbedSubtitle',
-                },
+                # Subtitles are embedded by _pp_worker after the download returns
                 # {
                 #     'key': 'EmbedThumbnail',
                 # }
             ],
-            'progress_hooks': [self.progress_hook],
+            # If FFmpegVideoConvertor is enabled, re-encode with the Pi's hardware
+            # H.264 encoder instead of libx264 on the CPU
+            # 'postprocessor_args': {
+            #     'videoconvertor': ['-c:v', 'h264_v4l2m2m', '-c:a', 'copy'],
+            # },
+            'noprogress': True, # Progress is drawn by _render_progress
+            'progress_hooks': [track_progress],
         }
 
+        if self.use_aria2c:
+            ydl_opts['external_downloader'] = {'default': 'aria2c'}
+            ydl_opts['external_downloader_args'] = {
+                'aria2c': ['-x', '16', '-s', '16', '--min-split-size=1M', '--max-connection-per-server=16']
+            }
+
         # Download the video
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
             try:
-                info = ydl.extract_info(url, download=True)
+                # Download from the info we already have instead of fetching the
+                # watch page again; it's out of the cache, so a retry after a
+                # failure (e.g. expired format URLs) extracts afresh. Strip the
+                # formats picked during extraction so ours are selected instead
+                info = ydl.process_ie_result(ydl.sanitize_info(info, remove_private_keys=True), download=True)
                 downloaded_file = ydl.prepare_filename(info)
             except Exception as e:
                 return {'status': 'error', 'message': str(e)}
+            finally:
+                with self._progress_lock:
+                    for filename in started_files:
+                        self._progress.pop(filename, None)
+                self._release_output(output_template)
+
+        # Hand subtitle embedding to the postprocessing worker
+        subtitles = [
+            (lang, subtitle['filepath'])
+            for lang, subtitle in (info.get('requested_subtitles') or {}).items()
+            if subtitle.get('filepath')
+        ]
+        if subtitles:
+            done = threading.Event()
+            self._pp_pending[info.get('id')] = done
+            self._pp_queue.put((info.get('id'), downloaded_file, subtitles, done))
 
         # Save to database
         video_data = {
@@ -202,7 +542,7 @@ class YouTubeDownloadManager:
             'view_count': info.get('view_count'),
             'is_short': is_short,
             'file_path': downloaded_file,
-            'thumbnail_path': info.get('thumbnail'),
+            'thumbnail_path': self.find_thumbnail_file(info),
             'download_date': datetime.now().isoformat(),
             'original_url': url,
             'status': 'completed'
@@ -221,9 +561,9 @@ class YouTubeDownloadManager:
     def download_playlist(self, playlist_url: str, custom_tags: Optional[List[str]] = None) -> Dict:
         """Download all videos from a playlist"""
 
-        # Extract playlist info
+        # Extract playlist info (ids and titles only, no per-video pages)
         ydl_opts = {
-            'extract_flat': True,
+            'extract_flat': 'in_playlist',
             'quiet': True,
         }
 
@@ -237,41 +577,76 @@ class YouTubeDownloadManager:
         playlist_id = playlist_info.get('id')
 
         # Save playlist to database
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT OR IGNORE INTO playlists (playlist_id, name, description, created_date)
-            VALUES (?, ?, ?, ?)
-        """, (playlist_id, playlist_name, playlist_info.get('description', ''),
-              datetime.now().isoformat()))
-        conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute("""
+                INSERT OR IGNORE INTO playlists (playlist_id, name, description, created_date)
+                VALUES (?, ?, ?, ?)
+            """, (playlist_id, playlist_name, playlist_info.get('description', ''),
+                  datetime.now().isoformat()))
 
-        cursor.execute("SELECT id FROM playlists WHERE playlist_id = ?", (playlist_id, ))
-        db_playlist_id = cursor.fetchone()[0]
-        conn.close()
+            cursor.execute("SELECT id FROM playlists WHERE playlist_id = ?", (playlist_id, ))
+            db_playlist_id = cursor.fetchone()[0]
 
-        # Download each video in playlist
         entries = playlist_info.get('entries', [])
-        results = []
-
-        for idx, entry in enumerate(entries):
-            video_url = entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
-            print(f"Downloading {idx + 1}/{len(entries)}: {entry.get('title')}")
-
-            result = self.download_video(video_url, custom_tags, playlist_name)
-
-            # Link to playlist
-            if result['status'] == 'success':
-                conn = sqlite3.connect(self.db_path)
-                cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO playlist_items (playlist_id, videos_id, position)
-                    VALUES (?, ?, ?)
-                """, (db_playlist_id, result['db_id'], idx))
-                conn.commit()
-                conn.close()
-
-            results.append(result)
+        video_urls = [
+            entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
+            for entry in entries
+        ]
+
+        # Prefetch metadata a bounded window ahead of the download workers, so
+        # downloads don't stall on it and unused info doesn't pile up in memory
+        prefetch_ahead = self.max_parallel_videos + self.METADATA_WORKERS
+        prefetches = [None] * len(video_urls)
+        results = [None] * len(entries)
+        new_entries = []
+
+        with ThreadPoolExecutor(max_workers=self.METADATA_WORKERS) as prefetcher, \
+                ThreadPoolExecutor(max_workers=self.max_parallel_videos) as executor:
+
+            def prefetch(idx):
+                if idx < len(video_urls):
+                    prefetches[idx] = prefetcher.submit(self._prefetch_info, video_urls[idx])
+
+            def download(idx):
+                # Starting video N queues the prefetch for video N + prefetch_ahead
+                prefetch(idx + prefetch_ahead)
+                if prefetches[idx] is not None:
+                    prefetches[idx].result()
+                return self.download_video(video_urls[idx], custom_tags, playlist_name)
+
+            for idx in range(min(prefetch_ahead, len(video_urls))):
+                prefetch(idx)
+
+            # Download playlist videos in parallel; workers mostly wait on the network
+            futures = {executor.submit(download, idx): idx for idx in range(len(video_urls))}
+
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {'status': 'error', 'message': str(e)}
+
+                self._log(f"Finished {idx + 1}/{len(entries)}: {entries[idx].get('title')} ({result['status']})")
+
+                if result['status'] == 'success':
+                    new_entries.append((result['video_id'], idx))
+
+                results[idx] = result
+
+        # Wait for this playlist's subtitles to finish embedding
+        for video_id, _ in new_entries:
+            done = self._pp_pending.get(video_id)
+            if done is not None:
+                done.wait()
+
+        # Link every downloaded video to the playlist in one transaction
+        if new_entries:
+            with self.transaction() as cursor:
+                cursor.execute(CREATE_NEW_ENTRIES_SQL)
+                cursor.executemany(INSERT_NEW_ENTRY_SQL, new_entries)
+                cursor.execute(INSERT_PLAYLIST_ITEMS_SQL, (db_playlist_id,))
+                cursor.execute("DELETE FROM temp.new_entries")
 
         return {
             'status': 'success',
@@ -280,6 +655,50 @@ class YouTubeDownloadManager:
             'results': results
         }
 
+    def _pp_worker(self):
+        """Embed subtitles into downloaded videos, one file at a time"""
+        while True:
+            video_id, video_file, subtitles, done = self._pp_queue.get()
+            try:
+                self.embed_subtitles(video_file, subtitles)
+            except Exception as e:
+                self._log(f"Embedding subtitles into {video_file} failed: {e}")
+            finally:
+                if self._pp_pending.get(video_id) is done:
+                    del self._pp_pending[video_id]
+                done.set()
+                self._pp_queue.task_done()
+
+    def embed_subtitles(self, video_file: str, subtitles: List[Tuple[str, str]]):
+        """Mux subtitle files into a video with ffmpeg, without re-encoding"""
+        ext = Path(video_file).suffix.lstrip('.').lower()
+        subtitle_codec = self.SUBTITLE_CODECS.get(ext)
+        if subtitle_codec is None or shutil.which('ffmpeg') is None:
+            # Leave the subtitle files next to the video
+            return
+
+        temp_file = f"{video_file}.temp.{ext}"
+        command = ['ffmpeg', '-y', '-loglevel', 'error', '-i', video_file]
+        for _, subtitle_file in subtitles:
+            command += ['-i', subtitle_file]
+        command += ['-map', '0']
+        for idx, (lang, _) in enumerate(subtitles):
+            command += ['-map', str(idx + 1)]
+            # Label the track the way FFmpegEmbedSubtitle did (ISO 639-2 code)
+            command += [f'-metadata:s:s:{idx}', f'language={ISO639Utils.short2long(lang) or lang}']
+        # Copy every stream bit-for-bit; only the subtitles are converted
+        command += ['-c', 'copy', '-c:s', subtitle_codec, temp_file]
+
+        try:
+            subprocess.run(command, check=True, capture_output=True)
+        except subprocess.CalledProcessError as e:
+            Path(temp_file).unlink(missing_ok=True)
+            raise RuntimeError(e.stderr.decode(errors='replace').strip()) from e
+
+        os.replace(temp_file, video_file)
+        for _, subtitle_file in subtitles:
+            Path(subtitle_file).unlink(missing_ok=True)
+
     def save_to_database(
             self,
             video_data: Dict,
@@ -288,90 +707,167 @@ class YouTubeDownloadManager:
         ) -> int:
         """Save video metadata to database"""
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Insert video
-        cursor.execute("""
-            INSERT OR REPLACE INTO videos 
-            (video_id, title, uploader, upload_date, duration, description, 
-             view_count, is_short, file_path, thumbnail_path, download_date, 
-             original_url, status)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            video_data.get('video_id'),
-            video_data.get('title'),
-            video_data.get('uploader'),
-            video_data.get('upload_date'),
-            video_data.get('duration'),
-            video_data.get('description'),
-            video_data.get('view_count'),
-            video_data.get('is_short', False),
-            video_data.get('file_path'),
-            video_data.get('thumbnail_path'),
-            video_data.get('download_date'),
-            video_data.get('original_url'),
-            video_data.get('status', 'completed')
-        ))
-
-        video_db_id = cursor.lastrowid
-
-        # Add default YouTube tag
-        all_tags = ['YouTube']
-        if tags:
-            all_tags.extend(tags)
-
-        for tag in all_tags:
-            cursor.execute("""
-                INSERT INTO tags (video_id, tag)
-                VALUES (?, ?)
-            """, (video_db_id, tag))
-
-        conn.commit()
-        conn.close()
+        # The video row and its tags commit together
+        with self.transaction() as cursor:
+            # Insert video
+            cursor.execute(INSERT_VIDEO_SQL, (
+                video_data.get('video_id'),
+                video_data.get('title'),
+                video_data.get('uploader'),
+                video_data.get('upload_date'),
+                video_data.get('duration'),
+                video_data.get('description'),
+                video_data.get('view_count'),
+                video_data.get('is_short', False),
+                video_data.get('file_path'),
+                video_data.get('thumbnail_path'),
+                video_data.get('download_date'),
+                video_data.get('original_url'),
+                video_data.get('status', 'completed')
+            ))
+
+            video_db_id = cursor.lastrowid
+
+            # Add default YouTube tag
+            all_tags = ['YouTube']
+            if tags:
+                all_tags.extend(tags)
+
+            cursor.executemany(INSERT_TAG_SQL, [(video_db_id, tag) for tag in all_tags])
+
+            # Invalidate cached listings
+            self._videos_version += 1
 
         return video_db_id
 
     def progress_hook(self, d):
-        """Display download progress"""
+        """Record download progress and apply the shared bandwidth cap"""
+        filename = d.get('filename')
         if d['status'] == 'downloading':
-            percent = d.get('_percent_str', 'N/A')
-            speed = d.get('_speed_str', 'N/A')
-            print(f"\rDownloading: {percent} at {speed}", end=' ')
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            with self._progress_lock:
+                # Start counting from the first report, so bytes resumed from an
+                # existing .part file aren't charged to the bucket
+                previous = self._progress.get(filename, (downloaded, None, None))[0]
+                self._progress[filename] = (downloaded, total, d.get('speed'))
+            if self._bucket is not None and downloaded > previous:
+                self._bucket.consume(downloaded - previous)
         elif d['status'] == 'finished':
-            print(f"\nDownload complete, processing...")
-
-    def get_all_videos(self, is_short: Optional[bool] = None) -> List[Dict]:
+            with self._progress_lock:
+                self._progress.pop(filename, None)
+
+    def _log(self, message: str):
+        """Print a message without garbling the progress status line"""
+        with self._stdout_lock:
+            if self._status_line:
+                # Blank out the status line; the renderer redraws it on its next tick
+                print(f"\r{'':<{len(self._status_line)}}\r", end='')
+                self._status_line = ''
+            print(message, flush=True)
+
+    def _render_progress(self):
+        """Draw one status line for all in-flight downloads, ten times a second"""
+        while True:
+            time.sleep(0.1)
+            with self._progress_lock:
+                progress = list(self._progress.items())
+
+            parts = []
+            for filename, (downloaded, total, speed) in progress:
+                percent = f"{100 * downloaded / total:5.1f}%" if total else f"{downloaded / 1e6:.1f}MB"
+                rate = f"{speed / 1e6:.1f}MB/s" if speed else 'N/A'
+                parts.append(f"{Path(filename).stem[:30]} {percent} at {rate}")
+            line = f"Downloading: {' | '.join(parts)}" if parts else ''
+
+            with self._stdout_lock:
+                last_line = self._status_line
+                if line != last_line:
+                    # Pad so a shorter line fully covers the previous one
+                    print(f"\r{line:<{len(last_line)}}", end='' if line else '\n', flush=True)
+                    self._status_line = line
+
+    def get_all_videos(self, is_short: Optional[bool] = None) -> List[sqlite3.Row]:
         """Retrieve all videos from database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self._lock:
+            cached = self._videos_cache.get(is_short)
+            if cached and cached[0] == self._videos_version:
+                return list(cached[1])
 
-        if is_short is None:
-            cursor.execute("SELECT * FROM videos WHERE status = 'completed'")
-        else:
-            cursor.execute("SELECT * FROM videos WHERE status = 'completed' AND is_short = ?", (is_short,))
+            cursor = self._conn.cursor()
 
-        columns = [description[0] for description in cursor.description]
-        videos = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            if is_short is None:
+                cursor.execute("SELECT * FROM videos WHERE status = 'completed' ORDER BY download_date DESC")
+            else:
+                cursor.execute("""
+                    SELECT * FROM videos
+                    WHERE status = 'completed' AND is_short = ?
+                    ORDER BY download_date DESC
+                """, (is_short,))
+
+            videos = cursor.fetchall()
+            self._videos_cache[is_short] = (self._videos_version, videos)
+
+        return list(videos)
+
+    def get_videos_page(
+            self,
+            is_short: bool,
+            query: str = '',
+            sort: str = 'recent',
+            limit: int = 50,
+            offset: int = 0
+        ) -> List[sqlite3.Row]:
+        """Retrieve one page of videos for the library grid"""
+        order_by = self.VIDEO_SORTS[sort]
+        # Prefix-match the words so results update as the user types
+        fts_query = self.build_search_query(query, prefix=True)
+
+        with self._lock:
+            cursor = self._conn.cursor()
+
+            if fts_query:
+                cursor.execute(f"""
+                    SELECT v.id, v.title, v.uploader, v.download_date, v.file_path
+                    FROM videos_fts f
+                    JOIN videos v ON v.id = f.rowid
+                    WHERE videos_fts MATCH ?
+                    AND v.status = 'completed' AND v.is_short = ?
+                    ORDER BY {order_by}
+                    LIMIT ? OFFSET ?
+                """, (fts_query, is_short, limit, offset))
+            else:
+                cursor.execute(f"""
+                    SELECT v.id, v.title, v.uploader, v.download_date, v.file_path
+                    FROM videos v
+                    WHERE v.status = 'completed' AND v.is_short = ?
+                    ORDER BY {order_by}
+                    LIMIT ? OFFSET ?
+                """, (is_short, limit, offset))
+
+            videos = cursor.fetchall()
 
-        conn.close()
         return videos
 
-    def search_videos(self, query: str) -> List[Dict]:
+    def search_videos(self, query: str) -> List[sqlite3.Row]:
         """Search videos by title or uploader"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        fts_query = self.build_search_query(query, prefix=True)
+        if not fts_query:
+            return []
 
-        cursor.execute("""
-            SELECT * FROM videos
-            WHERE (title LIKE ? OR uploader LIKE ?)
-            AND status = 'completed
-        """, (f'%{query}%', f'%{query}%'))
+        with self._lock:
+            cursor = self._conn.cursor()
+
+            cursor.execute("""
+                SELECT v.* FROM videos_fts f
+                JOIN videos v ON v.id = f.rowid
+                WHERE videos_fts MATCH ?
+                AND v.status = 'completed'
+                ORDER BY f.rank
+            """, (fts_query,))
 
-        columns = [description[0] for description in cursor.description]
-        videos = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            videos = cursor.fetchall()
 
-        conn.close()
         return videos
 
 
@@ -399,4 +895,6 @@ if __name__ == '__main__':
 
     # Get all shorts
     shorts = manager.get_all_videos(is_short=True)
-    print(f"Total shorts: {len(shorts)}")
\ No newline at end of file
+    print(f"Total shorts: {len(shorts)}")
+
+    manager.close()
\ No newline at end of file